@@ -15,15 +15,27 @@ import os
 import sys
 import time
 import json
+import fcntl
 import shutil
 import logging
+import logging.handlers
+import threading
 import configparser
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 from datetime import datetime
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 from watchdog.observers import Observer
 from watchdog.events import FileSystemEventHandler
 
+# Optional: streams multipart uploads instead of buffering whole PDFs in RAM
+try:
+    from requests_toolbelt import MultipartEncoder
+except ImportError:
+    MultipartEncoder = None
+
 # ============== CONFIGURATION ==============
 def load_config():
     """Load configuration from config.ini"""
@@ -43,6 +55,9 @@ def load_config():
             "processing_folder": base_folder / "processing",
             "logs_folder": base_folder / "logs",
             "poll_interval": config.getint("settings", "poll_interval", fallback=5),
+            "watch_interval": config.getint("settings", "watch_interval", fallback=30),
+            "max_concurrent": config.getint("settings", "max_concurrent", fallback=4),
+            "durable_writes": config.getboolean("settings", "durable_writes", fallback=False),
             "max_file_size": config.getint("settings", "max_file_size", fallback=52428800),
         }
     else:
@@ -55,29 +70,85 @@ def load_config():
             "processing_folder": base_folder / "processing",
             "logs_folder": base_folder / "logs",
             "poll_interval": 5,
+            "watch_interval": 30,
+            "max_concurrent": 4,
+            "durable_writes": False,
             "max_file_size": 50 * 1024 * 1024,
         }
 
-CONFIG = load_config()
+# Populated once by main() - avoids a second config parse at import time
+CONFIG = None
+
+# Filesystem types where inotify doesn't work reliably
+NETWORK_FS_TYPES = {"nfs", "nfs4", "cifs", "smbfs", "fuse.sshfs"}
+
+def is_network_mount(path):
+    """Check if path is on a network filesystem (parses /proc/mounts on Linux)"""
+    try:
+        resolved = str(Path(path).resolve())
+        best_mount = ""
+        best_fstype = ""
+        with open("/proc/mounts", "r") as f:
+            for line in f:
+                parts = line.split()
+                if len(parts) < 3:
+                    continue
+                mount_point, fstype = parts[1], parts[2]
+                # Match on path boundaries so /mnt/nfs doesn't claim
+                # /mnt/nfs-local (or vice versa)
+                if (resolved == mount_point or
+                        resolved.startswith(mount_point.rstrip('/') + '/')):
+                    if len(mount_point) > len(best_mount):
+                        best_mount = mount_point
+                        best_fstype = fstype
+        return best_fstype in NETWORK_FS_TYPES
+    except OSError:
+        # No /proc/mounts (e.g. macOS) - assume local filesystem
+        return False
 
 # ============== LOGGING SETUP ==============
-def setup_logging():
-    """Configure logging to file and console"""
-    log_file = CONFIG["logs_folder"] / f"converter_{datetime.now().strftime('%Y%m%d')}.log"
+def setup_logging(config):
+    """Configure logging to file and console (logs folder must exist)"""
+    log_file = config["logs_folder"] / f"converter_{datetime.now().strftime('%Y%m%d')}.log"
 
     logging.basicConfig(
         level=logging.INFO,
         format='%(asctime)s - %(levelname)s - %(message)s',
         handlers=[
-            logging.FileHandler(log_file, encoding='utf-8'),
+            logging.handlers.RotatingFileHandler(
+                log_file, maxBytes=5 * 1024 * 1024, backupCount=3, encoding='utf-8'
+            ),
             logging.StreamHandler(sys.stdout)
         ]
     )
-    return logging.getLogger(__name__)
 
-logger = setup_logging()
+logger = logging.getLogger(__name__)
 
 # ============== MINERU API CLIENT (v4) ==============
+# The API has returned several response shapes over time - probe each
+# known key path in order instead of chaining .get() calls
+_TASK_ID_PATHS = (('task_id',), ('data', 'task_id'), ('id',), ('data', 'id'))
+_STATUS_PATHS = (('status',), ('data', 'status'))
+_ERROR_PATHS = (('error',), ('data', 'error'), ('message',))
+_MD_PATHS = (
+    ('md_content',), ('md',), ('data', 'md_content'),
+    ('data', 'md'), ('result', 'md_content'),
+)
+
+def _dig(data, paths):
+    """Return the first non-empty value found at any of the key paths"""
+    for path in paths:
+        cur = data
+        for key in path:
+            if not isinstance(cur, dict) or key not in cur:
+                break
+            cur = cur[key]
+        else:
+            if cur:
+                return cur
+    return None
+
+
 class MinerUClient:
     """Client for MinerU Cloud API v4"""
 
@@ -88,6 +159,9 @@ class MinerUClient:
         "result": "/api/v4/extract/{}",          # Get result
     }
 
+    # Cached results are whole markdown documents - cap how many we keep
+    RESULT_CACHE_MAX = 500
+
     def __init__(self, api_key, api_base):
         self.api_key = api_key
         self.api_base = api_base.rstrip('/')
@@ -96,116 +170,216 @@ class MinerUClient:
         self.session.headers.update({
             "Authorization": f"Bearer {api_key}"
         })
+        # Retry transient failures (429/5xx, connection resets) with
+        # backoff so one bad response doesn't force a full re-upload.
+        # GET only: urllib3 can't rewind a streamed MultipartEncoder body,
+        # so uploads are retried at application level in upload_pdf
+        retry = Retry(
+            total=5,
+            backoff_factor=1.0,
+            status_forcelist=[429, 500, 502, 503, 504],
+            allowed_methods=["GET"],
+            respect_retry_after_header=True,
+        )
+        self.session.mount("https://", HTTPAdapter(
+            max_retries=retry, pool_connections=10, pool_maxsize=20
+        ))
+        # Completed results are immutable - cache them by task_id so
+        # duplicate fetches (retries, restarts) skip the API round-trip
+        self._result_cache = {}
+        self._cache_file = CONFIG["output_folder"] / ".cache" / "results.json"
+        self._cache_lock = threading.Lock()  # saves happen on worker threads
+        self._load_result_cache()
+        # ETags from status responses, for conditional polling GETs
+        self._etags = {}
+
+    def _load_result_cache(self):
+        """Load cached results from previous runs"""
+        try:
+            if self._cache_file.exists():
+                with open(self._cache_file, 'r', encoding='utf-8') as f:
+                    self._result_cache = json.load(f)
+                # Trim anything past the cap left over from older runs
+                while len(self._result_cache) > self.RESULT_CACHE_MAX:
+                    self._result_cache.pop(next(iter(self._result_cache)))
+        except Exception as e:
+            logger.debug("Cache load failed: %s", e)
+            self._result_cache = {}
 
-    def upload_pdf(self, pdf_path):
+    def _save_result_cache(self):
+        """Persist result cache so restarts don't re-fetch"""
+        try:
+            self._cache_file.parent.mkdir(parents=True, exist_ok=True)
+            # Serialize writers and dump a snapshot: workers may insert
+            # while we iterate, and the tmp + rename keeps the file whole
+            # even if two saves race or the process dies mid-write
+            with self._cache_lock:
+                snapshot = dict(self._result_cache)
+                tmp_path = self._cache_file.with_suffix('.json.tmp')
+                with open(tmp_path, 'w', encoding='utf-8') as f:
+                    json.dump(snapshot, f)
+                tmp_path.rename(self._cache_file)
+        except Exception as e:
+            logger.debug("Cache save failed: %s", e)
+
+    def _cache_result(self, task_id, md_content):
+        """Store a result, evicting the oldest entries past the size cap"""
+        with self._cache_lock:
+            self._result_cache[task_id] = md_content
+            while len(self._result_cache) > self.RESULT_CACHE_MAX:
+                self._result_cache.pop(next(iter(self._result_cache)))
+        self._save_result_cache()
+
+    def upload_pdf(self, pdf_path, file_size=None):
         """
         Upload PDF to MinerU for conversion
         Endpoint: POST /api/v4/extract/task
+
+        Returns (task_id, md_content) - md_content is filled in when the
+        upload response already carries the result, else None. Callers
+        that already stat'ed the file can pass file_size to skip a syscall.
         """
         try:
             # Check file size
-            file_size = os.path.getsize(pdf_path)
+            if file_size is None:
+                file_size = pdf_path.stat().st_size
+            size_mb = file_size / 1048576
             if file_size > CONFIG["max_file_size"]:
-                raise ValueError(f"File too large: {file_size / 1024 / 1024:.1f}MB")
+                raise ValueError(f"File too large: {size_mb:.1f}MB")
 
-            logger.info(f"📤 Uploading {pdf_path.name} ({file_size / 1024 / 1024:.1f}MB)...")
+            logger.info("📤 Uploading %s (%.1fMB)...", pdf_path.name, size_mb)
 
             url = f"{self.api_base}{self.ENDPOINTS['extract']}"
 
-            # Prepare multipart form data
-            with open(pdf_path, 'rb') as f:
-                files = {
-                    'file': (pdf_path.name, f, 'application/pdf')
-                }
-
-                # Don't set Content-Type for multipart - let requests handle it
-                headers = {
-                    "Authorization": f"Bearer {self.api_key}"
-                }
-
-                response = requests.post(
-                    url,
-                    files=files,
-                    headers=headers,
-                    timeout=120
-                )
-
-            logger.debug(f"Upload response status: {response.status_code}")
-            logger.debug(f"Upload response: {response.text[:500]}")
+            # Retry transient upload failures here rather than in urllib3,
+            # reopening the file (and rebuilding the encoder) per attempt
+            # because a partially-sent streamed body can't be rewound
+            for attempt in range(3):
+                try:
+                    with open(pdf_path, 'rb') as f:
+                        if MultipartEncoder is not None:
+                            # Stream the body in chunks rather than buffering
+                            # the whole PDF before sending
+                            encoder = MultipartEncoder(
+                                fields={'file': (pdf_path.name, f, 'application/pdf')}
+                            )
+                            response = self.session.post(
+                                url,
+                                data=encoder,
+                                headers={"Content-Type": encoder.content_type},
+                                timeout=120
+                            )
+                        else:
+                            # Auth header is already on the session; don't set
+                            # Content-Type for multipart - let requests handle it
+                            response = self.session.post(
+                                url,
+                                files={'file': (pdf_path.name, f, 'application/pdf')},
+                                timeout=120
+                            )
+                except requests.RequestException as e:
+                    if attempt == 2:
+                        raise
+                    wait = 2 ** attempt
+                    logger.warning("⚠️  Upload error (%s), retrying in %ds...", e, wait)
+                    time.sleep(wait)
+                    continue
+
+                if response.status_code not in [429, 500, 502, 503, 504]:
+                    break
+
+                wait = 2 ** attempt
+                logger.warning("⚠️  Upload got %s, retrying in %ds...",
+                               response.status_code, wait)
+                time.sleep(wait)
+
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug("Upload response status: %s", response.status_code)
+                logger.debug("Upload response: %s", response.content[:500])
 
             if response.status_code in [200, 201]:
                 result = response.json()
 
-                # Try different possible response structures
-                task_id = (
-                    result.get('task_id') or
-                    result.get('data', {}).get('task_id') or
-                    result.get('id') or
-                    result.get('data', {}).get('id')
-                )
+                task_id = _dig(result, _TASK_ID_PATHS)
 
                 if task_id:
-                    logger.info(f"✅ Upload successful. Task ID: {task_id}")
-                    return task_id
+                    logger.info("✅ Upload successful. Task ID: %s", task_id)
+                    # Some responses embed the result directly - returning
+                    # it here skips the status/result round-trips
+                    md_content = _dig(result, _MD_PATHS)
+                    if md_content:
+                        self._cache_result(task_id, md_content)
+                    return task_id, md_content
                 else:
-                    logger.error(f"❌ No task_id in response: {result}")
-                    return None
+                    logger.error("❌ No task_id in response: %s", result)
+                    return None, None
             else:
-                logger.error(f"❌ Upload failed: {response.status_code}")
-                logger.error(f"Response: {response.text}")
-                return None
+                logger.error("❌ Upload failed: %s", response.status_code)
+                logger.error("Response: %s", response.content[:500])
+                return None, None
 
         except Exception as e:
-            logger.error(f"❌ Upload error: {e}")
+            logger.error("❌ Upload error: %s", e)
             import traceback
             logger.debug(traceback.format_exc())
-            return None
+            return None, None
 
     def check_status(self, task_id):
         """
         Check conversion status
         Endpoint: GET /api/v1/tasks/{task_id}
+
+        Returns (is_complete, md_content) - md_content is filled in when
+        the status response already carries the result, else None
         """
         try:
             url = f"{self.api_base}{self.ENDPOINTS['status'].format(task_id)}"
 
-            response = self.session.get(url, timeout=30)
+            # Conditional GET: a 304 means nothing changed since last poll,
+            # so we skip downloading and parsing the body
+            headers = {}
+            if task_id in self._etags:
+                headers["If-None-Match"] = self._etags[task_id]
+
+            response = self.session.get(url, headers=headers, timeout=30)
+
+            if response.status_code == 304:
+                return False, None
 
             if response.status_code == 200:
+                etag = response.headers.get("ETag")
+                if etag:
+                    self._etags[task_id] = etag
+
                 data = response.json()
-                status = (
-                    data.get('status') or
-                    data.get('data', {}).get('status') or
-                    'unknown'
-                )
+                status = _dig(data, _STATUS_PATHS) or 'unknown'
 
-                logger.debug(f"Task {task_id} status: {status}")
+                logger.debug("Task %s status: %s", task_id, status)
 
                 if status == 'completed' or status == 'succeeded':
-                    # Return task_id for result retrieval
-                    return True, task_id
+                    # Some responses embed the result - return it so the
+                    # caller can skip the separate get_result fetch
+                    md_content = _dig(data, _MD_PATHS)
+                    if md_content:
+                        self._cache_result(task_id, md_content)
+                    return True, md_content
                 elif status in ['failed', 'error']:
-                    error_msg = (
-                        data.get('error') or
-                        data.get('data', {}).get('error') or
-                        data.get('message') or
-                        'Unknown error'
-                    )
-                    logger.error(f"❌ Conversion failed: {error_msg}")
+                    error_msg = _dig(data, _ERROR_PATHS) or 'Unknown error'
+                    logger.error("❌ Conversion failed: %s", error_msg)
                     return False, None
                 else:
                     # Still processing
                     return False, None
 
             elif response.status_code == 404:
-                logger.warning(f"⚠️  Task not found: {task_id}")
+                logger.warning("⚠️  Task not found: %s", task_id)
                 return False, None
 
-            logger.debug(f"Status check: {response.status_code}")
+            logger.debug("Status check: %s", response.status_code)
             return False, None
 
         except Exception as e:
-            logger.error(f"❌ Status check error: {e}")
+            logger.error("❌ Status check error: %s", e)
             return False, None
 
     def get_result(self, task_id):
@@ -213,6 +387,10 @@ class MinerUClient:
         Get conversion result (markdown content)
         Endpoint: GET /api/v4/extract/{task_id}
         """
+        if task_id in self._result_cache:
+            logger.debug("Result cache hit for task %s", task_id)
+            return True, self._result_cache[task_id]
+
         try:
             url = f"{self.api_base}{self.ENDPOINTS['result'].format(task_id)}"
 
@@ -221,175 +399,259 @@ class MinerUClient:
             if response.status_code == 200:
                 data = response.json()
 
-                # Try different possible response structures
-                md_content = (
-                    data.get('md_content') or
-                    data.get('md') or
-                    data.get('data', {}).get('md_content') or
-                    data.get('data', {}).get('md') or
-                    data.get('result', {}).get('md_content')
-                )
+                md_content = _dig(data, _MD_PATHS)
 
                 if md_content:
+                    self._cache_result(task_id, md_content)
                     return True, md_content
                 else:
                     logger.error(f"❌ No markdown content in response")
-                    logger.debug(f"Response keys: {data.keys()}")
+                    logger.debug("Response keys: %s", data.keys())
                     return False, None
             else:
-                logger.error(f"❌ Get result failed: {response.status_code}")
-                logger.debug(f"Response: {response.text[:500]}")
+                logger.error("❌ Get result failed: %s", response.status_code)
+                if logger.isEnabledFor(logging.DEBUG):
+                    logger.debug("Response: %s", response.content[:500])
                 return False, None
 
         except Exception as e:
-            logger.error(f"❌ Get result error: {e}")
+            logger.error("❌ Get result error: %s", e)
             return False, None
 
     def download_markdown(self, md_content, output_path):
         """Save markdown content to file"""
         try:
-            logger.info(f"💾 Saving markdown to {output_path.name}...")
-
-            with open(output_path, 'w', encoding='utf-8') as f:
-                f.write(md_content)
-
-            logger.info(f"✅ Saved: {output_path}")
+            logger.info("💾 Saving markdown to %s...", output_path.name)
+
+            # Encode once and write in a single unbuffered syscall, going
+            # through a temp file + rename so readers never see a partial file
+            data = md_content.encode('utf-8')
+            tmp_path = output_path.with_suffix(output_path.suffix + '.tmp')
+            with open(tmp_path, 'wb', buffering=0) as f:
+                f.write(data)
+                if CONFIG.get("durable_writes"):
+                    os.fsync(f.fileno())
+            tmp_path.rename(output_path)
+
+            logger.info("✅ Saved: %s", output_path)
             return True
 
         except Exception as e:
-            logger.error(f"❌ Save error: {e}")
+            logger.error("❌ Save error: %s", e)
             return False
 
 # ============== FILE WATCHER ==============
+def move_file(src, dst):
+    """Rename src to dst - a single rename(2) syscall when both paths are
+    on the same filesystem, falling back to shutil.move if they cross devices"""
+    try:
+        src.rename(dst)
+    except OSError:
+        shutil.move(str(src), str(dst))
+
+
+# Accepted PDF suffix spellings - checked with str.endswith on the raw
+# event path so non-PDF events (temp files, swap files, dotfiles) bail
+# out before any Path construction or directory stat
+_PDF_SUFFIXES = ('.pdf', '.PDF', '.Pdf')
+
+
 class PDFHandler(FileSystemEventHandler):
     """Handles new PDF files in watch folder"""
 
     def __init__(self, client):
         self.client = client
         self.processing = set()
+        self._lock = threading.Lock()
+        self._pending = {}  # path -> debounce Timer
+        # Each PDF's processing is independent I/O waiting - run them on
+        # worker threads so the observer thread never blocks
+        self.executor = ThreadPoolExecutor(max_workers=CONFIG["max_concurrent"])
 
     def on_created(self, event):
         """Called when a new file is created"""
-        if event.is_directory:
-            return
-
-        path = Path(event.src_path)
-
         # Only process PDF files
-        if path.suffix.lower() != '.pdf':
+        if not event.src_path.endswith(_PDF_SUFFIXES):
             return
 
-        # Skip if already processing
-        if path.name in self.processing:
+        if event.is_directory:
             return
 
-        # Wait for file to be fully written
-        time.sleep(2)
-
-        if not path.exists():
-            return
+        path = Path(event.src_path)
 
-        logger.info(f"🔔 New PDF detected: {path.name}")
-        self.process_pdf(path)
+        logger.info("🔔 New PDF detected: %s", path.name)
+        self._debounce(path)
 
     def on_moved(self, event):
         """Called when a file is moved into watch folder"""
+        # Only process PDF files
+        if not event.dest_path.endswith(_PDF_SUFFIXES):
+            return
+
         if event.is_directory:
             return
 
         path = Path(event.dest_path)
 
-        # Only process PDF files
-        if path.suffix.lower() != '.pdf':
-            return
+        logger.info("🔔 PDF moved to folder: %s", path.name)
+        self._debounce(path)
+
+    def _debounce(self, path):
+        """Reset the settle timer for path - rapid event bursts (create ->
+        modify -> move from sync tools) collapse into one processing run"""
+        key = str(path)
+        with self._lock:
+            timer = self._pending.pop(key, None)
+            if timer is not None:
+                timer.cancel()
+            timer = threading.Timer(2.0, self._enqueue, args=(path,))
+            timer.daemon = True
+            self._pending[key] = timer
+            timer.start()
+
+    def _enqueue(self, path):
+        """Hand a settled file to the worker pool once its size is stable"""
+        with self._lock:
+            self._pending.pop(str(path), None)
 
-        # Skip if already processing
-        if path.name in self.processing:
+        try:
+            size = path.stat().st_size
+            time.sleep(0.1)
+            if path.stat().st_size != size:
+                # Still being written - wait another round
+                self._debounce(path)
+                return
+        except FileNotFoundError:
             return
 
-        logger.info(f"🔔 PDF moved to folder: {path.name}")
-        self.process_pdf(path)
+        # Pass the size along so upload_pdf doesn't stat again
+        self.executor.submit(self.process_pdf, path, size)
+
+    def _save_result(self, pdf_path, processing_path, md_content):
+        """Write the markdown and move the source PDF to the output folder"""
+        output_filename = pdf_path.stem + ".md"
+        output_path = CONFIG["output_folder"] / output_filename
+
+        if self.client.download_markdown(md_content, output_path):
+            # Success - move original PDF to output folder
+            final_pdf = CONFIG["output_folder"] / pdf_path.name
+            move_file(processing_path, final_pdf)
+            logger.info("=" * 50)
+            logger.info("✅ Conversion complete: %s", output_filename)
+            logger.info("📁 Location: %s", output_path)
+            logger.info("=" * 50)
 
-    def process_pdf(self, pdf_path):
-        """Process a single PDF file"""
-        self.processing.add(pdf_path.name)
+    def process_pdf(self, pdf_path, file_size=None):
+        """Process a single PDF file (runs on a worker thread)"""
+        with self._lock:
+            if pdf_path.name in self.processing:
+                return
+            self.processing.add(pdf_path.name)
+
+        # Cross-instance mutual exclusion: if a second converter watches
+        # the same folder, only the one holding the flock uploads this PDF
+        lock_path = CONFIG["processing_folder"] / (pdf_path.name + ".lock")
+        lock_fd = os.open(str(lock_path), os.O_CREAT | os.O_RDWR)
+        try:
+            fcntl.flock(lock_fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            # Another instance already has this PDF
+            os.close(lock_fd)
+            with self._lock:
+                self.processing.discard(pdf_path.name)
+            return
 
         try:
-            # Move to processing folder
+            # Move to processing folder (the file may have vanished since
+            # the event fired)
             processing_path = CONFIG["processing_folder"] / pdf_path.name
-            shutil.move(str(pdf_path), str(processing_path))
+            try:
+                move_file(pdf_path, processing_path)
+            except FileNotFoundError:
+                return
 
-            logger.info(f"📋 Processing: {pdf_path.name}")
+            logger.info("📋 Processing: %s", pdf_path.name)
             logger.info("=" * 50)
 
             # Upload to MinerU
-            task_id = self.client.upload_pdf(processing_path)
+            task_id, md_content = self.client.upload_pdf(processing_path, file_size)
 
             if not task_id:
-                logger.error(f"❌ Failed to upload {pdf_path.name}")
+                logger.error("❌ Failed to upload %s", pdf_path.name)
                 # Move back to input for retry
-                shutil.move(str(processing_path), str(pdf_path))
+                move_file(processing_path, pdf_path)
                 return
 
-            # Poll for completion
-            max_attempts = 180  # 15 minutes max (180 * 5s)
-            logger.info(f"⏳ Waiting for conversion...")
-
-            for attempt in range(max_attempts):
-                time.sleep(CONFIG["poll_interval"])
-
-                is_complete, result = self.client.check_status(task_id)
-
-                if is_complete and result:
-                    # Get markdown content
-                    success, md_content = self.client.get_result(result)
-
-                    if success and md_content:
-                        # Save markdown
-                        output_filename = pdf_path.stem + ".md"
-                        output_path = CONFIG["output_folder"] / output_filename
+            if md_content:
+                # Result came back inline with the upload - no polling needed
+                self._save_result(pdf_path, processing_path, md_content)
+                return
 
-                        if self.client.download_markdown(md_content, output_path):
-                            # Success - move original PDF to output folder
-                            final_pdf = CONFIG["output_folder"] / pdf_path.name
-                            shutil.move(str(processing_path), str(final_pdf))
-                            logger.info("=" * 50)
-                            logger.info(f"✅ Conversion complete: {output_filename}")
-                            logger.info(f"📁 Location: {output_path}")
-                            logger.info("=" * 50)
+            # Poll for completion with exponential backoff (2s -> 60s cap)
+            max_wait = 900  # 15 minutes max
+            delay = CONFIG["poll_interval"]
+            elapsed = 0
+            last_report = 0
+            logger.info("⏳ Waiting for conversion...")
+
+            while elapsed < max_wait:
+                time.sleep(delay)
+                elapsed += delay
+
+                is_complete, md_content = self.client.check_status(task_id)
+
+                if is_complete:
+                    if not md_content:
+                        # Status response had no inline result - fetch it
+                        success, md_content = self.client.get_result(task_id)
+                        if not success or not md_content:
+                            logger.error("❌ Failed to get result")
                             break
-                    else:
-                        logger.error("❌ Failed to get result")
-                        break
+
+                    self._save_result(pdf_path, processing_path, md_content)
+                    break
 
                 # Show progress every 30 seconds
-                if (attempt + 1) % 6 == 0:
-                    elapsed = (attempt + 1) * CONFIG["poll_interval"]
-                    logger.info(f"⏳ Still processing... ({elapsed}s elapsed)")
+                if elapsed - last_report >= 30:
+                    logger.info("⏳ Still processing... (%ds elapsed)", elapsed)
+                    last_report = elapsed
+
+                # Back off between polls
+                delay = min(delay * 1.5, 60)
 
             else:
-                logger.error(f"❌ Timeout waiting for conversion: {pdf_path.name}")
+                logger.error("❌ Timeout waiting for conversion: %s", pdf_path.name)
                 # Move back to input for retry
-                shutil.move(str(processing_path), str(pdf_path))
+                move_file(processing_path, pdf_path)
 
         except Exception as e:
-            logger.error(f"❌ Processing error: {e}")
+            logger.error("❌ Processing error: %s", e)
             import traceback
             logger.debug(traceback.format_exc())
             # Try to move back to input
             processing_path = CONFIG["processing_folder"] / pdf_path.name
             if processing_path.exists():
-                shutil.move(str(processing_path), str(pdf_path))
+                move_file(processing_path, pdf_path)
         finally:
-            self.processing.discard(pdf_path.name)
+            with self._lock:
+                self.processing.discard(pdf_path.name)
+            fcntl.flock(lock_fd, fcntl.LOCK_UN)
+            os.close(lock_fd)
+            lock_path.unlink(missing_ok=True)
 
 # ============== MAIN ==============
 def main():
     """Main entry point"""
-    # Reload config to get API key
     global CONFIG
     CONFIG = load_config()
 
+    # Create directories before the log file handler needs them
+    for folder in [CONFIG["watch_folder"], CONFIG["output_folder"],
+                   CONFIG["processing_folder"], CONFIG["logs_folder"]]:
+        folder.mkdir(parents=True, exist_ok=True)
+
+    setup_logging(CONFIG)
+
     # Check API key
     if not CONFIG["api_key"] or CONFIG["api_key"] == "YOUR_API_KEY_HERE":
         logger.error("=" * 60)
@@ -402,17 +664,18 @@ def main():
         logger.info("")
         return
 
-    # Create directories
-    for folder in [CONFIG["watch_folder"], CONFIG["output_folder"],
-                   CONFIG["processing_folder"], CONFIG["logs_folder"]]:
-        folder.mkdir(parents=True, exist_ok=True)
-
     # Initialize client
     client = MinerUClient(CONFIG["api_key"], CONFIG["api_base"])
 
-    # Setup file watcher
+    # Setup file watcher - inotify misses events on network mounts,
+    # so fall back to polling there
     event_handler = PDFHandler(client)
-    observer = Observer()
+    if is_network_mount(CONFIG["watch_folder"]):
+        from watchdog.observers.polling import PollingObserver
+        logger.info(f"🌐 Network mount detected, polling every {CONFIG['watch_interval']}s")
+        observer = PollingObserver(timeout=CONFIG["watch_interval"])
+    else:
+        observer = Observer()
     observer.schedule(event_handler, str(CONFIG["watch_folder"]), recursive=False)
     observer.start()
 
@@ -434,6 +697,8 @@ def main():
             time.sleep(1)
     except KeyboardInterrupt:
         observer.stop()
+        # Let in-flight conversions finish before exiting
+        event_handler.executor.shutdown(wait=True)
         logger.info("")
         logger.info("=" * 60)
         logger.info("👋 Stopped by user")
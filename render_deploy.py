@@ -3,15 +3,17 @@ FastAPI Web Service for Render.com Deployment
 Converts PDFs using MinerU API - Free Cloud Hosting!
 
 Requirements:
-pip install fastapi uvicorn python-multipart requests
+pip install fastapi uvicorn python-multipart httpx
 """
 
 from fastapi import FastAPI, UploadFile, File, HTTPException
-from fastapi.responses import JSONResponse, PlainTextResponse
-import requests
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
+import httpx
 import os
+import json
+import functools
 from typing import Optional
-import time
+import asyncio
 
 app = FastAPI(title="MinerU PDF Converter", version="1.0")
 
@@ -19,6 +21,57 @@ app = FastAPI(title="MinerU PDF Converter", version="1.0")
 MINERU_API_KEY = os.getenv("MINERU_API_KEY", "")
 MINERU_API_BASE = "https://mineru.net"
 
+# Completed results are immutable - cache by task_id to skip repeat API
+# calls. Entries are whole markdown documents, so cap how many we keep
+_RESULT_CACHE: dict = {}
+_RESULT_CACHE_MAX = 500
+
+def _cache_result(task_id: str, md_content: str):
+    """Store a result, evicting the oldest entries past the size cap"""
+    _RESULT_CACHE[task_id] = md_content
+    while len(_RESULT_CACHE) > _RESULT_CACHE_MAX:
+        _RESULT_CACHE.pop(next(iter(_RESULT_CACHE)))
+
+@functools.lru_cache(maxsize=1)
+def get_client() -> httpx.AsyncClient:
+    """Shared async client, built once on first use - reuses TCP/TLS
+    connections and carries the auth header so handlers don't rebuild it"""
+    return httpx.AsyncClient(
+        timeout=httpx.Timeout(120.0),
+        headers={'Authorization': f'Bearer {MINERU_API_KEY}'},
+        limits=httpx.Limits(max_connections=50, max_keepalive_connections=20),
+    )
+
+@app.on_event("startup")
+async def prime_client():
+    get_client()
+
+@app.on_event("shutdown")
+async def close_client():
+    await get_client().aclose()
+
+# The API has returned several response shapes over time - probe each
+# known key path in order instead of chaining .get() calls
+_TASK_ID_PATHS = (('task_id',), ('data', 'task_id'), ('id',), ('data', 'id'))
+_STATUS_PATHS = (('status',), ('data', 'status'))
+_MD_PATHS = (
+    ('md_content',), ('md',), ('data', 'md_content'),
+    ('data', 'md'), ('result', 'md_content'),
+)
+
+def _dig(data, paths):
+    """Return the first non-empty value found at any of the key paths"""
+    for path in paths:
+        cur = data
+        for key in path:
+            if not isinstance(cur, dict) or key not in cur:
+                break
+            cur = cur[key]
+        else:
+            if cur:
+                return cur
+    return None
+
 # Health check endpoint (Render uses this)
 @app.get("/health")
 async def health_check():
@@ -35,6 +88,7 @@ async def root():
             "POST /convert": "Upload PDF and get task_id",
             "GET /status/{task_id}": "Check conversion status",
             "GET /result/{task_id}": "Get markdown result",
+            "GET /stream/{task_id}": "Stream status updates via Server-Sent Events",
             "POST /convert-and-wait": "Upload and wait for completion"
         }
     }
@@ -51,29 +105,21 @@ async def convert_pdf(file: UploadFile = File(...)):
         raise HTTPException(status_code=500, detail="MINERU_API_KEY not configured")
 
     try:
-        # Read file
-        pdf_content = await file.read()
-
         # Check file size (Render free tier limit)
-        if len(pdf_content) > 50 * 1024 * 1024:  # 50MB
+        if file.size and file.size > 50 * 1024 * 1024:  # 50MB
             raise HTTPException(status_code=413, detail="File too large (max 50MB)")
 
-        # Upload to MinerU
-        response = requests.post(
+        # Upload to MinerU - pass the spooled file so httpx streams it
+        # in chunks instead of holding the whole PDF in RAM
+        response = await get_client().post(
             f"{MINERU_API_BASE}/api/v4/extract/task",
-            files={'file': (file.filename, pdf_content, 'application/pdf')},
-            headers={'Authorization': f'Bearer {MINERU_API_KEY}'},
+            files={'file': (file.filename, file.file, 'application/pdf')},
             timeout=120
         )
 
         if response.status_code in [200, 201]:
             result = response.json()
-            task_id = (
-                result.get('task_id') or
-                result.get('data', {}).get('task_id') or
-                result.get('id') or
-                result.get('data', {}).get('id')
-            )
+            task_id = _dig(result, _TASK_ID_PATHS)
 
             if task_id:
                 return {
@@ -100,19 +146,14 @@ async def check_status(task_id: str):
         raise HTTPException(status_code=500, detail="MINERU_API_KEY not configured")
 
     try:
-        response = requests.get(
+        response = await get_client().get(
             f"{MINERU_API_BASE}/api/v1/tasks/{task_id}",
-            headers={'Authorization': f'Bearer {MINERU_API_KEY}'},
             timeout=30
         )
 
         if response.status_code == 200:
             data = response.json()
-            status = (
-                data.get('status') or
-                data.get('data', {}).get('status') or
-                'unknown'
-            )
+            status = _dig(data, _STATUS_PATHS) or 'unknown'
 
             return {
                 "task_id": task_id,
@@ -136,24 +177,21 @@ async def get_result(task_id: str):
     if not MINERU_API_KEY:
         raise HTTPException(status_code=500, detail="MINERU_API_KEY not configured")
 
+    if task_id in _RESULT_CACHE:
+        return PlainTextResponse(content=_RESULT_CACHE[task_id])
+
     try:
-        response = requests.get(
+        response = await get_client().get(
             f"{MINERU_API_BASE}/api/v4/extract/{task_id}",
-            headers={'Authorization': f'Bearer {MINERU_API_KEY}'},
             timeout=60
         )
 
         if response.status_code == 200:
             data = response.json()
-            md_content = (
-                data.get('md_content') or
-                data.get('md') or
-                data.get('data', {}).get('md_content') or
-                data.get('data', {}).get('md') or
-                data.get('result', {}).get('md_content')
-            )
+            md_content = _dig(data, _MD_PATHS)
 
             if md_content:
+                _cache_result(task_id, md_content)
                 return PlainTextResponse(content=md_content)
 
         raise HTTPException(status_code=404, detail="Result not found")
@@ -161,8 +199,77 @@ async def get_result(task_id: str):
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.get("/stream/{task_id}")
+async def stream_status(task_id: str):
+    """
+    Stream status updates via Server-Sent Events until the task finishes,
+    so clients hold one connection open instead of polling /status
+
+    Usage:
+    curl -N https://your-app.onrender.com/stream/TASK_ID
+    """
+    if not MINERU_API_KEY:
+        raise HTTPException(status_code=500, detail="MINERU_API_KEY not configured")
+
+    async def event_generator():
+        delay = 2
+        elapsed = 0
+        last_status = None
+
+        while elapsed < 900:
+            status = 'unknown'
+            try:
+                response = await get_client().get(
+                    f"{MINERU_API_BASE}/api/v1/tasks/{task_id}",
+                    timeout=30
+                )
+                if response.status_code == 200:
+                    status = _dig(response.json(), _STATUS_PATHS) or 'unknown'
+            except Exception:
+                # Transient error talking to MinerU - keep the stream
+                # alive and try again next backoff round
+                pass
+
+            # Only emit an event when something actually changed
+            if status != last_status:
+                yield f"data: {json.dumps({'status': status})}\n\n"
+                last_status = status
+
+            if status in ['completed', 'succeeded']:
+                md_content = _RESULT_CACHE.get(task_id)
+                if md_content is None:
+                    try:
+                        result_response = await get_client().get(
+                            f"{MINERU_API_BASE}/api/v4/extract/{task_id}",
+                            timeout=60
+                        )
+                        if result_response.status_code == 200:
+                            md_content = _dig(result_response.json(), _MD_PATHS)
+                            if md_content:
+                                _cache_result(task_id, md_content)
+                    except Exception as e:
+                        # End the stream with a terminal event rather than
+                        # letting the exception truncate it mid-stream
+                        yield f"data: {json.dumps({'done': True, 'error': str(e)})}\n\n"
+                        return
+
+                yield f"data: {json.dumps({'done': True, 'markdown': md_content})}\n\n"
+                return
+
+            if status in ['failed', 'error']:
+                yield f"data: {json.dumps({'done': True, 'error': status})}\n\n"
+                return
+
+            await asyncio.sleep(delay)
+            elapsed += delay
+            delay = min(delay * 1.5, 60)
+
+        yield f"data: {json.dumps({'done': True, 'error': 'timeout'})}\n\n"
+
+    return StreamingResponse(event_generator(), media_type="text/event-stream")
+
 @app.post("/convert-and-wait")
-async def convert_and_wait(file: UploadFile = File(...), max_wait: int = 180):
+async def convert_and_wait(file: UploadFile = File(...), max_wait: int = 900):
     """
     Upload PDF and wait for conversion to complete
 
@@ -173,12 +280,13 @@ async def convert_and_wait(file: UploadFile = File(...), max_wait: int = 180):
         raise HTTPException(status_code=500, detail="MINERU_API_KEY not configured")
 
     try:
-        # Step 1: Upload
-        pdf_content = await file.read()
-        upload_response = requests.post(
+        # Step 1: Upload (streamed, same as /convert)
+        if file.size and file.size > 50 * 1024 * 1024:  # 50MB
+            raise HTTPException(status_code=413, detail="File too large (max 50MB)")
+
+        upload_response = await get_client().post(
             f"{MINERU_API_BASE}/api/v4/extract/task",
-            files={'file': (file.filename, pdf_content, 'application/pdf')},
-            headers={'Authorization': f'Bearer {MINERU_API_KEY}'},
+            files={'file': (file.filename, file.file, 'application/pdf')},
             timeout=120
         )
 
@@ -186,53 +294,41 @@ async def convert_and_wait(file: UploadFile = File(...), max_wait: int = 180):
             raise HTTPException(status_code=500, detail="Upload failed")
 
         result = upload_response.json()
-        task_id = (
-            result.get('task_id') or
-            result.get('data', {}).get('task_id') or
-            result.get('id') or
-            result.get('data', {}).get('id')
-        )
+        task_id = _dig(result, _TASK_ID_PATHS)
 
         if not task_id:
             raise HTTPException(status_code=500, detail="No task_id returned")
 
-        # Step 2: Poll for completion
-        for attempt in range(max_wait):
-            time.sleep(5)  # Wait 5 seconds between checks
+        # Step 2: Poll for completion with exponential backoff (2s -> 60s cap)
+        delay = 2
+        elapsed = 0
+        while elapsed < max_wait:
+            await asyncio.sleep(delay)
+            elapsed += delay
+            delay = min(delay * 1.5, 60)
 
-            status_response = requests.get(
+            status_response = await get_client().get(
                 f"{MINERU_API_BASE}/api/v1/tasks/{task_id}",
-                headers={'Authorization': f'Bearer {MINERU_API_KEY}'},
                 timeout=30
             )
 
             if status_response.status_code == 200:
                 status_data = status_response.json()
-                status = (
-                    status_data.get('status') or
-                    status_data.get('data', {}).get('status') or
-                    'unknown'
-                )
+                status = _dig(status_data, _STATUS_PATHS) or 'unknown'
 
                 if status in ['completed', 'succeeded']:
                     # Step 3: Get result
-                    result_response = requests.get(
+                    result_response = await get_client().get(
                         f"{MINERU_API_BASE}/api/v4/extract/{task_id}",
-                        headers={'Authorization': f'Bearer {MINERU_API_KEY}'},
                         timeout=60
                     )
 
                     if result_response.status_code == 200:
                         result_data = result_response.json()
-                        md_content = (
-                            result_data.get('md_content') or
-                            result_data.get('md') or
-                            result_data.get('data', {}).get('md_content') or
-                            result_data.get('data', {}).get('md') or
-                            result_data.get('result', {}).get('md_content')
-                        )
+                        md_content = _dig(result_data, _MD_PATHS)
 
                         if md_content:
+                            _cache_result(task_id, md_content)
                             return {
                                 "success": True,
                                 "task_id": task_id,